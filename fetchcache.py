@@ -0,0 +1,93 @@
+"""
+little on-disk cache for pages the scripts keep re-fetching (vox vocab, log listings, ...).
+a cached page is used as-is for ttl seconds, after that it's revalidated with If-None-Match / If-Modified-Since.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Tuple
+
+
+CACHE_DIR = r"C:\tmp\fetchcache"
+
+
+def _paths(url: str, cache_dir: str) -> Tuple[str, str, str]:
+    key = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+    return key + '.json', key + '.body', key + '.parsed.json'
+
+
+def _write(path: str, data: bytes):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _fetch(url: str, ttl: float, cache_dir: str) -> Tuple[bytes, bool]:
+    # -> (body, whether the body is new since last time)
+    meta_path, body_path, _ = _paths(url, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        meta, body = None, None
+    now = time.time()
+    if meta and now - meta['fetched'] < ttl:
+        return body, False
+
+    # only pay for the http stack when we actually have to go out
+    import urllib.error
+    import urllib.request
+    headers = {}
+    if meta and meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta and meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        resp = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or not meta:
+            raise
+        meta['fetched'] = now
+        _write(meta_path, json.dumps(meta).encode('utf-8'))
+        return body, False
+    body = resp.read()
+    _write(body_path, body)
+    meta = {
+        'url': url,
+        'fetched': now,
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+    _write(meta_path, json.dumps(meta).encode('utf-8'))
+    return body, True
+
+
+def fetch(url: str, ttl: float = 3600, cache_dir: str = CACHE_DIR) -> bytes:
+    """
+    Body of url, from the cache if it's younger than ttl seconds, else revalidated/re-downloaded.
+    :param ttl: seconds a cached copy is trusted without asking the server (0 = always revalidate)
+    """
+    return _fetch(url, ttl, cache_dir)[0]
+
+
+def fetch_parsed(url: str, parse: Callable[[bytes], Any], ttl: float = 3600, cache_dir: str = CACHE_DIR) -> Any:
+    """
+    Like fetch, but hands back parse(body), which has to be JSON-able. The parsed result is cached
+    too and only redone when the body actually changes, so a cache hit never has to parse anything.
+    """
+    body, fresh = _fetch(url, ttl, cache_dir)
+    parsed_path = _paths(url, cache_dir)[2]
+    if not fresh:
+        try:
+            with open(parsed_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    result = parse(body)
+    _write(parsed_path, json.dumps(result).encode('utf-8'))
+    return result
@@ -0,0 +1,214 @@
+"""
+corpus-wide stats over a pile of midis (instruments, drum hits, pitch/velocity spreads, notes/sec, polyphony).
+notes get flattened into one typed array per field so the counting happens in C instead of per-note loops.
+  python midistats.py songs/*.mid > stats.json
+"""
+import bisect
+import collections
+import itertools
+import json
+import logging
+import operator
+import os
+import sys
+from array import array
+from typing import Iterable, List
+
+from funmid import MidiFile, MidiNote, SimplyNotes, midi_instrument_to_str, midi_percussion_to_str
+
+
+DRUM_CHANNEL = 9
+# channel byte -> 1/0 row masks, applied to a whole channel column at once with bytes.translate
+_DRUM_ROWS = bytes(int(ch == DRUM_CHANNEL) for ch in range(256))
+_MELODIC_ROWS = bytes(int(ch != DRUM_CHANNEL) for ch in range(256))
+
+
+def ticks_to_seconds(tick: int, bpm_info: dict, ticks_per_beat: int) -> float:
+    """
+    Wall clock time of a tick, following the tempo map.
+    :param bpm_info: {tick: bpm} tempo changes, like SimplyNotes.bpm_info (120 bpm until the first one)
+    :return: seconds, or 0 if the timing info is unusable
+    """
+    if not ticks_per_beat or ticks_per_beat <= 0:
+        return 0.0
+    secs, last_t, bpm = 0.0, 0, 120
+    for ts, new_bpm in sorted(bpm_info.items()):
+        if ts > tick:
+            break
+        if bpm > 0:
+            secs += (ts - last_t) / ticks_per_beat * 60 / bpm
+        last_t, bpm = ts, new_bpm
+    if bpm > 0:
+        secs += (tick - last_t) / ticks_per_beat * 60 / bpm
+    return secs
+
+
+class NoteColumns:
+    """
+    Note-on events from many SimplyNotes, concatenated into one array per field.
+    Song i's rows are offsets[i]:offsets[i+1].
+    """
+
+    def __init__(self):
+        self.t = array('Q')
+        self.dur = array('Q')
+        self.note = array('B')
+        self.velocity = array('B')
+        self.patch = array('B')
+        self.channel = array('B')
+        self.offsets = array('Q', [0])
+        # per song
+        self.names = []
+        self.ticks = array('Q')
+        self.seconds = array('d')
+
+    def __len__(self):
+        return len(self.t)
+
+    def songs(self) -> int:
+        return len(self.names)
+
+    def add(self, song: SimplyNotes, name: str = None):
+        """
+        Append a song's note-ons (note offs are already folded into their on's dur).
+        :param name: what to call it in the per-song stats (default: its index)
+        """
+        ons = [n for n in song.notes if n.what == MidiNote.NOTE_ON]
+        start = len(self.t)
+        for field in ('t', 'dur', 'note', 'velocity', 'patch', 'channel'):
+            getattr(self, field).extend(map(operator.attrgetter(field), ons))
+        self.offsets.append(len(self.t))
+        end = max(map(operator.add, self.t[start:], self.dur[start:]), default=0)
+        self.names.append(str(len(self.names)) if name is None else name)
+        self.ticks.append(end)
+        self.seconds.append(ticks_to_seconds(end, song.bpm_info, song.ticks_per_beat))
+
+    def shard(self, n: int) -> List['NoteColumns']:
+        """Split into at most n pieces of whole songs, in order."""
+        n = max(1, min(n, self.songs()))
+        bounds = [self.songs() * i // n for i in range(n + 1)]
+        shards = []
+        for a, b in zip(bounds, bounds[1:]):
+            lo, hi = self.offsets[a], self.offsets[b]
+            part = NoteColumns()
+            for field in ('t', 'dur', 'note', 'velocity', 'patch', 'channel'):
+                setattr(part, field, getattr(self, field)[lo:hi])
+            part.offsets = array('Q', (off - lo for off in self.offsets[a:b + 1]))
+            part.names = self.names[a:b]
+            part.ticks = self.ticks[a:b]
+            part.seconds = self.seconds[a:b]
+            shards.append(part)
+        return shards
+
+
+def peak_polyphony(starts: List[int], ends: List[int]) -> int:
+    """Most notes sounding at once; both lists sorted. A note ending as another starts doesn't overlap it."""
+    return max(map(lambda i, s: i - bisect.bisect_right(ends, s), itertools.count(1), starts), default=0)
+
+
+def summarize_partial(cols: NoteColumns) -> dict:
+    """
+    Raw counts for one batch of songs; combine batches with merge_summaries.
+    """
+    chan = cols.channel.tobytes()
+    drum_rows = chan.translate(_DRUM_ROWS)
+    melodic_rows = chan.translate(_MELODIC_ROWS)
+    songs = []
+    for i, name in enumerate(cols.names):
+        a, b = cols.offsets[i], cols.offsets[i + 1]
+        t, dur = cols.t[a:b], cols.dur[a:b]
+        secs, ticks = cols.seconds[i], cols.ticks[i]
+        songs.append({
+            'name': name,
+            'notes': b - a,
+            'seconds': secs,
+            'notes_per_second': (b - a) / secs if secs else 0.0,
+            'peak_polyphony': peak_polyphony(sorted(t), sorted(map(operator.add, t, dur))),
+            # average number of notes sounding over the whole song
+            'mean_polyphony': sum(dur) / ticks if ticks else 0.0,
+        })
+    return {
+        'instruments': collections.Counter(itertools.compress(cols.patch, melodic_rows)),
+        'drums': collections.Counter(itertools.compress(cols.note, drum_rows)),
+        'pitches': collections.Counter(itertools.compress(cols.note, melodic_rows)),
+        'velocities': collections.Counter(cols.velocity),
+        'songs': songs,
+    }
+
+
+def merge_summaries(parts: Iterable[dict]) -> dict:
+    """
+    Add up summarize_partial results (in song order) into the final summary.
+    :return: totals, instrument/drum usage by name (most used first), 128-bin pitch/velocity histograms, per-song stats
+    """
+    instruments, drums = collections.Counter(), collections.Counter()
+    pitches, velocities = collections.Counter(), collections.Counter()
+    songs = []
+    for part in parts:
+        instruments.update(part['instruments'])
+        drums.update(part['drums'])
+        pitches.update(part['pitches'])
+        velocities.update(part['velocities'])
+        songs += part['songs']
+    notes = sum(s['notes'] for s in songs)
+    seconds = sum(s['seconds'] for s in songs)
+    return {
+        'songs': len(songs),
+        'notes': notes,
+        'seconds': seconds,
+        'notes_per_second': notes / seconds if seconds else 0.0,
+        'peak_polyphony': max((s['peak_polyphony'] for s in songs), default=0),
+        # once per distinct patch/note, and these cope with junk bytes >= 128 from odd files
+        'instruments': [(midi_instrument_to_str(patch), count) for patch, count in instruments.most_common()],
+        'drums': [(midi_percussion_to_str(note), count) for note, count in drums.most_common()],
+        'pitches': [pitches[n] for n in range(128)],
+        'velocities': [velocities[v] for v in range(128)],
+        'by_song': songs,
+    }
+
+
+def summarize(cols: NoteColumns, workers: int = 1) -> dict:
+    """
+    Corpus summary of already-collected columns.
+    :param workers: split the per-song work across this many processes; shipping the columns over
+                    usually costs more than it saves unless there are a lot of very long songs
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or cols.songs() < 2 * workers:
+        return merge_summaries([summarize_partial(cols)])
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_summaries(pool.map(summarize_partial, cols.shard(workers)))
+
+
+def _summarize_files(paths: List[str]) -> dict:
+    # runs in the process pool: parse a shard of files and hand back just the counts
+    cols = NoteColumns()
+    for fn in paths:
+        try:
+            song = MidiFile(fn).to_simplynotes()
+        except Exception as e:
+            # funmid trips over bad files in all sorts of ways (asserts, overruns, a 0 tempo dividing by zero...)
+            logging.warning("skipping %s: %r", fn, e)
+            continue
+        cols.add(song, fn)
+    return summarize_partial(cols)
+
+
+def summarize_files(paths: List[str], workers: int = None) -> dict:
+    """
+    Parse and summarize a bunch of .mid files, in shards across a process pool.
+    Files that don't parse are logged and left out.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = min(len(paths), workers * 4) or 1  # a few shards per worker so one slow file doesn't hold everyone up
+    shards = [paths[len(paths) * i // n:len(paths) * (i + 1) // n] for i in range(n)]
+    if workers == 1 or n == 1:
+        return merge_summaries(map(_summarize_files, shards))
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_summaries(pool.map(_summarize_files, shards))
+
+
+if __name__ == "__main__":
+    print(json.dumps(summarize_files(sys.argv[1:]), indent=1))
@@ -0,0 +1,75 @@
+"""
+midistats over little hand-built midi files.
+  python -m pytest -q test_midistats.py
+"""
+import struct
+
+import pytest
+
+import midistats
+
+
+def vlq(n):
+    out = [n & 0x7F]
+    n >>= 7
+    while n:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    return bytes(reversed(out))
+
+
+def midi_file(events, ticks_per_beat=96):
+    track = b''.join(vlq(delta) + data for delta, data in events) + vlq(0) + b'\xff\x2f\x00'
+    return (b'MThd' + struct.pack('>IHHH', 6, 0, 1, ticks_per_beat)
+            + b'MTrk' + struct.pack('>I', len(track)) + track)
+
+
+def tempo(us_per_qtr_note):
+    return b'\xff\x51\x03' + us_per_qtr_note.to_bytes(3, 'big')
+
+
+# 120 bpm, nylon guitar: two notes overlapping a bass drum hit, 2 beats = 1 second long
+SONG = midi_file([
+    (0, tempo(500000)),
+    (0, b'\xc0\x18'),
+    (0, b'\x90\x3c\x40'), (0, b'\x90\x40\x50'), (0, b'\x99\x24\x64'),
+    (96, b'\x80\x3c\x00'), (0, b'\x89\x24\x00'), (96, b'\x80\x40\x00'),
+])
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_summarize_files(tmp_path, workers):
+    paths = []
+    for i in range(3):
+        path = tmp_path / ('song%d.mid' % i)
+        path.write_bytes(SONG)
+        paths.append(str(path))
+    summary = midistats.summarize_files(paths, workers)
+    assert summary['songs'] == 3
+    assert summary['notes'] == 9
+    assert summary['seconds'] == pytest.approx(3.0)
+    assert summary['peak_polyphony'] == 3
+    assert summary['instruments'] == [('Acoustic Guitar (nylon)', 6)]
+    assert summary['drums'] == [('Bass Drum 1', 3)]
+    assert summary['pitches'][0x3c] == 3 and summary['pitches'][0x40] == 3 and sum(summary['pitches']) == 6
+    assert [s['name'] for s in summary['by_song']] == paths
+    assert summary['by_song'][0]['mean_polyphony'] == pytest.approx(2.0)
+
+
+def test_bad_files_are_skipped(tmp_path):
+    good = tmp_path / 'good.mid'
+    good.write_bytes(SONG)
+    # a 0 us/quarter note tempo divides by zero in funmid, a cut off header overruns the buffer
+    zero_tempo = tmp_path / 'zero_tempo.mid'
+    zero_tempo.write_bytes(midi_file([(0, tempo(0)), (0, b'\x90\x3c\x40'), (96, b'\x80\x3c\x00')]))
+    truncated = tmp_path / 'truncated.mid'
+    truncated.write_bytes(b'MThd\0\0\0\6junk')
+    summary = midistats.summarize_files([str(zero_tempo), str(good), str(truncated)], workers=1)
+    assert summary['songs'] == 1
+    assert summary['by_song'][0]['name'] == str(good)
+
+
+def test_junk_patch_byte(tmp_path):
+    path = tmp_path / 'junk.mid'
+    path.write_bytes(midi_file([(0, b'\xc0\xc8'), (0, b'\x90\x3c\x40'), (96, b'\x80\x3c\x00')]))
+    assert midistats.summarize_files([str(path)], workers=1)['instruments'] == [('?? 200 ??', 1)]
@@ -0,0 +1,244 @@
+"""
+VoxCounter & friends have to give exactly what the original regex counting (get_log_counts_regex) gives.
+  python -m pytest -q test_voxmetrix.py
+"""
+import random
+
+import pytest
+
+import voxmetrix
+
+
+VOCAB = ['hi', 'a', 's', "'s", "n't", 'don', 'it', 'bob', 'b4', 'x-ray', 'a.m', 'c++', 'From', '1']
+
+# log -> nonzero counts, as get_log_counts_regex has them
+GOLDEN = {
+    'contractions': ("don't it's hi's bob'sn't\nit'snt don'tt\n",
+                     {'hi': 1, "'s": 4, "n't": 3, 'it': 2, 'bob': 1}),
+    'from_lines': ('From bob\nhi a hi\nFrom hi a\nhi hi hi\n',
+                   {'hi': 5, 'a': 2, 'bob': 1, 'From': 2}),
+    'one_line_from': ('From bob hi a', {}),
+    'one_line_from_contraction': ("Fromn't a", {}),
+    'digits': ('hi1 1hi 2a3 a 1 11 hi\n', {'hi': 2, 'a': 1, '1': 2}),
+    'angles': ('<hi> >a< hi>x x<a a>\n', {'hi': 1, 'a': 1}),
+    'fallback': ('b4 x-ray a.m c++ b4b4 -x-ray- 4b4 a.m.\n',
+                 {'a': 2, 'b4': 3, 'x-ray': 2, 'a.m': 2, 'c++': 1}),
+    'repeats': ('hi hi hi-hi-hi a a\n', {'hi': 3, 'a': 1}),
+}
+
+PIECES = list("ab's n't-+.,?!<>1\n\t") + [
+    'From bob\n', 'hi', 'hi hi', "don't", "it's", ' ', '<', '>', '42', 'b4', 'x-ray', 'a.m', 'c++',
+]
+
+
+def nonzero(counts):
+    return {w: c for w, c in counts.items() if c}
+
+
+def random_log(rng, n):
+    log = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, n)))
+    if rng.random() < 0.1:
+        log = rng.choice(['From ', 'From', "Fromn't", "From's"]) + log.replace('\n', '')
+    return log
+
+
+@pytest.mark.parametrize('name', sorted(GOLDEN))
+def test_golden(name):
+    log, expected = GOLDEN[name]
+    assert nonzero(voxmetrix.get_log_counts_regex(log, VOCAB)) == expected
+    assert nonzero(voxmetrix.get_log_counts(log, VOCAB)) == expected
+
+
+def test_random_whole_and_chunked():
+    rng = random.Random(2021)
+    for _ in range(3000):
+        log = random_log(rng, 40)
+        ref = voxmetrix.get_log_counts_regex(log, VOCAB)
+        assert voxmetrix.get_log_counts(log, VOCAB) == ref, log
+        counter = voxmetrix.VoxCounter(VOCAB)
+        step = rng.randint(1, 5)
+        for i in range(0, len(log), step):
+            counter.feed(log[i:i + step])
+        assert counter.finish() == ref, log
+
+
+def test_random_count_log_file(tmp_path):
+    rng = random.Random(2022)
+    path = tmp_path / 'vox.txt'
+    for _ in range(200):
+        log = random_log(rng, 200)
+        path.write_text(log, encoding='utf-8', newline='')
+        ref = voxmetrix.get_log_counts_regex(log, VOCAB)
+        assert voxmetrix.count_log_file(str(path), VOCAB, 'utf-8', chunk_size=rng.randint(1, 32)) == ref, log
+
+
+def test_random_merge_partials():
+    rng = random.Random(2023)
+    for _ in range(2000):
+        logs = [random_log(rng, 12) for _ in range(rng.randint(2, 6))]
+        # main() glues the logs together with a newline after each
+        ref = voxmetrix.get_log_counts_regex(''.join(log + '\n' for log in logs), VOCAB)
+        parts = [voxmetrix.count_log_partial(log, VOCAB) for log in logs]
+        assert voxmetrix.merge_partials(parts, VOCAB) == ref, logs
+
+
+def test_random_range_partials(tmp_path):
+    rng = random.Random(2024)
+    path = tmp_path / 'vox.txt'
+    for _ in range(300):
+        lines = [random_log(rng, 15).replace('\n', ' ') for _ in range(rng.randint(2, 10))]
+        log = '\n'.join(lines) + rng.choice(['', '\n'])
+        data = log.encode('utf-8')
+        path.write_bytes(data)
+        line_starts = [i + 1 for i, b in enumerate(data[:-1]) if b == ord('\n')]
+        if not line_starts:
+            continue
+        bounds = [0] + sorted(rng.sample(line_starts, rng.randint(1, len(line_starts)))) + [len(data)]
+        parts = [voxmetrix._count_range_partial(str(path), a, b, VOCAB, 'utf-8', False)
+                 for a, b in zip(bounds, bounds[1:])]
+        assert voxmetrix.merge_partials(parts, VOCAB) == voxmetrix.get_log_counts_regex(log, VOCAB), (log, bounds)
+
+
+def test_count_log_file_parallel(tmp_path):
+    rng = random.Random(2025)
+    log = '\n'.join(random_log(rng, 30).replace('\n', ' ') for _ in range(500)) + '\n'
+    path = tmp_path / 'vox.txt'
+    path.write_text(log, encoding='utf-8', newline='')
+    ref = voxmetrix.get_log_counts_regex(log, VOCAB)
+    assert voxmetrix.count_log_file_parallel(str(path), VOCAB, workers=3, encoding='utf-8') == ref
+
+
+NAMES = ['bob', 'al', "rook's", 'x, "y"', '']
+
+
+def random_speaker_log(rng, n_lines):
+    lines = []
+    for _ in range(n_lines):
+        r = rng.random()
+        if r < 0.25:
+            lines.append('From ' + rng.choice(NAMES))
+        elif r < 0.6:
+            # short lines: a word ending one line eats the newline the same word starting the next one needs
+            lines.append(rng.choice(['hi', 'a', 'hi hi', 'a hi', 'b4', 'x-ray', "it's", 'hi From']))
+        else:
+            lines.append(random_log(rng, 12).replace('\n', ' '))
+    return '\n'.join(lines) + rng.choice(['', '\n'])
+
+
+def speaker_table(stats):
+    return {u: dict(stats.top_words(u, len(stats.words))) for u in stats.users}
+
+
+def test_random_speaker_range_partials(tmp_path):
+    rng = random.Random(2026)
+    path = tmp_path / 'vox.txt'
+    for _ in range(300):
+        log = random_speaker_log(rng, rng.randint(2, 12))
+        data = log.encode('utf-8')
+        path.write_bytes(data)
+        counts, stats = voxmetrix.count_log_file(str(path), VOCAB, 'utf-8', chunk_size=rng.randint(1, 16), speakers=True)
+        assert counts == voxmetrix.get_log_counts_regex(log, VOCAB), log
+        line_starts = [i + 1 for i, b in enumerate(data[:-1]) if b == ord('\n')]
+        if not line_starts:
+            continue
+        bounds = [0] + sorted(rng.sample(line_starts, rng.randint(1, len(line_starts)))) + [len(data)]
+        parts = [voxmetrix._count_range_partial(str(path), a, b, VOCAB, 'utf-8', True)
+                 for a, b in zip(bounds, bounds[1:])]
+        assert voxmetrix.merge_partials(parts, VOCAB) == counts, (log, bounds)
+        assert speaker_table(voxmetrix.merge_speaker_partials(parts)) == speaker_table(stats), (log, bounds)
+
+
+def test_speaker_golden():
+    # "hi a" up top isn't anyone's; the From lines' own words aren't anyone's either
+    log = 'hi a\nFrom bob\nhi. hi a\nFrom al, the "great"\nhi\nhi a a\nFrom bob\na hi\n'
+    vocab = ['hi', 'a', 'bob', 'From']
+    counter = voxmetrix.VoxCounter(vocab, speakers=True)
+    counter.feed(log)
+    assert counter.finish() == {'hi': 5, 'a': 4, 'bob': 2, 'From': 3}
+    stats = counter.speaker_stats()
+    assert stats.top_words('bob') == [('hi', 3), ('a', 2)]
+    assert stats.top_words('bob', 1) == [('hi', 3)]
+    assert stats.top_words('nobody') == []
+    assert stats.top_users('hi') == [('bob', 3), ('al, the "great"', 1)]
+    assert stats.top_users('a', 1) == [('bob', 2)]
+    assert stats.to_csv() == (
+        'User,Word,Count\n'
+        '"al, the ""great""",a,1\n'
+        '"al, the ""great""",hi,1\n'
+        'bob,hi,3\n'
+        'bob,a,2\n'
+    )
+
+
+def test_space_saving_bounds():
+    rng = random.Random(2027)
+    for capacity in (5, 20, 50):
+        sketch = voxmetrix.SpaceSaving(capacity)
+        exact = {}
+        for _ in range(5000):
+            # skewed stream, plenty of evictions among the rare items
+            item = 'w%d' % min(int(rng.paretovariate(1.2)), 300)
+            exact[item] = exact.get(item, 0) + 1
+            sketch.add(item)
+        assert sketch.total == 5000
+        reported = {item: (count, err) for item, count, err in sketch.top(capacity)}
+        for item, (count, err) in reported.items():
+            assert count - err <= exact.get(item, 0) <= count, (item, count, err)
+        for item, c in exact.items():
+            if c > sketch.total / capacity:
+                assert item in reported, (capacity, item, c)
+
+
+def test_phrase_breaks():
+    miner = voxmetrix.PhraseMiner(2, 3)
+    counter = voxmetrix.VoxCounter(['hello', 'world'], phrases=miner)
+    # spaces/tabs keep a phrase going; newlines, digits and punctuation break it
+    counter.feed('hello world\nhello 42 world\nhello, world\nhello.world\nhello\tworld  hello\n')
+    counter.finish()
+    top = miner.top(10)
+    assert sorted(top[2]) == [('hello world', 2, 0), ('world hello', 1, 0)]
+    assert top[3] == [('hello world hello', 1, 0)]
+
+
+def test_random_rollup(tmp_path):
+    rng = random.Random(2028)
+    path = str(tmp_path / 'vox.rollup')
+    days = sorted({'2021-%02d-%02d' % (rng.randint(1, 3), rng.randint(1, 28)) for _ in range(12)})
+    # the first log is plain so the one-line From quirk (see merge_partials) can't come up
+    logs = {'%s-0.txt' % days[0]: 'hi a'}
+    for day in days:
+        for i in range(rng.randint(1, 3)):
+            logs.setdefault('%s-%d.txt' % (day, i), random_log(rng, 15))
+    parts = {fn: voxmetrix.count_log_partial(log, VOCAB) for fn, log in logs.items()}
+    voxmetrix.build_rollup(voxmetrix.daily_counts(parts), VOCAB, path)
+
+    # what each day adds to the counts of the whole history glued together main()-style
+    glued, running, per_day = '', voxmetrix.get_log_counts_regex('', VOCAB), {}
+    for day in days:
+        glued += ''.join(log + '\n' for fn, log in logs.items() if voxmetrix.log_day(fn) == day)
+        counts = voxmetrix.get_log_counts_regex(glued, VOCAB)
+        per_day[day] = {w: counts[w] - running[w] for w in VOCAB}
+        running = counts
+
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    assert head[:8] == b'VOXROLL1' and (12 + int.from_bytes(head[8:], 'little')) % 8 == 0
+    rollup = voxmetrix.VoxRollup(path)
+    try:
+        assert rollup.days == days
+        assert rollup.totals() == voxmetrix.merge_partials(list(parts.values()), VOCAB) == running
+        for w in VOCAB:
+            assert rollup.daily(w) == [(day, per_day[day][w]) for day in days]
+        for _ in range(200):
+            a, b = sorted('2021-%02d-%02d' % (rng.randint(1, 3), rng.randint(1, 30)) for _ in range(2))
+            w = rng.choice(VOCAB)
+            expected = sum(per_day[day][w] for day in days if a <= day <= b)
+            assert rollup.count(w, a, b) == rollup.totals(a, b)[w] == expected, (w, a, b)
+            if a < b:
+                assert rollup.count(w, b, a) == 0
+                assert rollup.daily(w, b, a) == []
+        assert rollup.count('nope') == 0
+        # start after end is an empty range, not a negative count
+        assert rollup.totals(days[-1], days[0]) == {w: 0 for w in VOCAB}
+    finally:
+        rollup.close()
@@ -0,0 +1,199 @@
+"""
+timings + sanity checks for the text crunching bits of voxmetrix and wheeloffun, on made up data.
+every engine's output gets checked against the original regex versions, results go out as JSON.
+  python textbench.py --sizes 1000,10000,100000 --out bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+import voxmetrix
+import wheeloffun
+
+
+USERS = ['rook', 'spoocecow', 'bob', "al's", 'dont']
+# punctuation that sits right on the edges of the vox regex's boundary classes
+SEPARATORS = [' ', ' ', ' ', ', ', '. ', '! ', '?', '-', '+', ' <', '> ', '1', '\t', '..', '  ']
+CONTRACTIONS = ["don't", "it's", "rook's", "can't", "won't", "'s", "n't"]
+# vocab words with digits/dashes/regex specials take VoxCounter's regex fallback
+ODD_WORDS = ['b4', 'x-ray', 'a.m', 'c++']
+
+
+def make_vocab(n: int, rng: random.Random) -> List[str]:
+    words = {''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 9))) for _ in range(n)}
+    return sorted(words) + ["'s", "n't", 'don', 'it', 'From'] + ODD_WORDS
+
+
+def make_vox_log(n_lines: int, vocab: List[str], rng: random.Random) -> str:
+    lines = []
+    for _ in range(n_lines):
+        if rng.random() < 0.15:
+            lines.append('From %s' % rng.choice(USERS))
+            continue
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            r = rng.random()
+            if r < 0.75:
+                parts.append(rng.choice(vocab))
+            elif r < 0.85:
+                parts.append(rng.choice(CONTRACTIONS))
+            else:
+                parts.append(rng.choice(['lol', 'VOX', 'hello', '42', 'word<', '>x']))
+            parts.append(rng.choice(SEPARATORS))
+        if rng.random() < 0.5:
+            parts.pop()  # no trailing separator on half the lines
+        lines.append(''.join(parts))
+    return '\n'.join(lines)
+
+
+WHEEL_LINE = 'never gonna give you up never gonna let you down'
+LYRIC_WORDS = ['love', 'baby', 'night', 'never', 'gonna', 'give', 'you', 'up', 'down', 'let', 'the', 'a',
+               'heart', 'tonight', 'forever', 'oh', 'yeah', 'dance', 'run', 'around', 'desert']
+
+
+def make_lyrics(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(8, 40)):
+        line = ' '.join(rng.choice(LYRIC_WORDS) for _ in range(rng.randint(3, 10)))
+        lines.append(line + rng.choice(['', ',', '!', '...', '?']))
+    if rng.random() < 0.05:
+        lines.insert(rng.randrange(len(lines)), WHEEL_LINE)
+    return '\n'.join(lines)
+
+
+def make_lyric_page(lyric_id: int, rng: random.Random) -> bytes:
+    return (
+        '<html><head><title>Song %d Lyrics | SongMeanings</title></head><body>'
+        '<a id="header-comments-counter" href="#comments">%d Comments</a>'
+        '<div class="lyric-box">\n%s\n</div></body></html>'
+    ).encode('utf-8') % (lyric_id, rng.randint(0, 2000), make_lyrics(rng).encode('utf-8'))
+
+
+def timed(fn: Callable, repeat: int):
+    best, res = None, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        res = fn()
+        secs = time.perf_counter() - t
+        best = secs if best is None else min(best, secs)
+    return best, res
+
+
+def bench_vox(sizes: List[int], args, rng: random.Random) -> List[dict]:
+    vocab = make_vocab(args.vocab_size, rng)
+    results = []
+    for size in sizes:
+        log = make_vox_log(size, vocab, rng)
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8', newline='') as f:
+            f.write(log)
+        try:
+            engines = {
+                'counter': lambda: voxmetrix.get_log_counts(log, vocab),
+                'stream': lambda: voxmetrix.count_log_file(f.name, vocab, encoding='utf-8'),
+                'parallel': lambda: voxmetrix.count_log_file_parallel(f.name, vocab, args.workers, 'utf-8'),
+            }
+            if size <= args.regex_max_lines:
+                engines = dict(regex=lambda: voxmetrix.get_log_counts_regex(log, vocab), **engines)
+            reference, ref_name = None, None
+            for name, fn in engines.items():
+                secs, counts = timed(fn, args.repeat)
+                if reference is None:
+                    reference, ref_name = counts, name
+                results.append({
+                    'bench': 'vox_count', 'engine': name, 'lines': size, 'bytes': len(log.encode('utf-8')),
+                    'vocab': len(vocab), 'secs': secs, 'reference': ref_name, 'identical': counts == reference,
+                })
+        finally:
+            os.remove(f.name)
+    return results
+
+
+def bench_lyrics(sizes: List[int], args, rng: random.Random) -> List[dict]:
+    results = []
+    for size in sizes:
+        pages = [make_lyric_page(i, rng) for i in range(size)]
+        secs, parsed = timed(lambda: [wheeloffun._parse_and_match(i, p, wheeloffun.WHEEL_RE) for i, p in enumerate(pages)], args.repeat)
+        results.append({'bench': 'lyrics_parse', 'engine': 'bs4', 'songs': size, 'secs': secs})
+
+        lyrics = [row[3] for row in parsed]
+        secs, regex_hits = timed(lambda: {i for i, ly in enumerate(lyrics) if wheeloffun.WHEEL_RE.findall(ly)}, args.repeat)
+        results.append({'bench': 'lyrics_match', 'engine': 'regex', 'songs': size, 'secs': secs, 'matches': len(regex_hits)})
+
+        with tempfile.NamedTemporaryFile(suffix='.corpus', delete=False) as f:
+            path = f.name
+        try:
+            t = time.perf_counter()
+            with open(path, 'wb') as f:
+                f.write(wheeloffun.CORPUS_MAGIC)
+                for lyric_id, title, comments, ly, _, _, _ in parsed:
+                    f.write(wheeloffun.corpus_record(lyric_id, title, comments, ly))
+            build_secs = time.perf_counter() - t
+            corpus = wheeloffun.Corpus(path)
+            secs, found = timed(lambda: corpus.search(wheeloffun.WHEEL_PATTERN, args.workers), args.repeat)
+            # get_lyrics_match picks a random match, so check the songs plus that each pick is a real match
+            identical = {lid for lid, _, _ in found} == regex_hits and all(
+                lm in wheeloffun.WHEEL_RE.findall(lyrics[lid]) for lid, _, lm in found
+            )
+            results.append({'bench': 'lyrics_match', 'engine': 'corpus', 'songs': size, 'secs': secs,
+                            'build_secs': build_secs, 'matches': len(found), 'reference': 'regex', 'identical': identical})
+        finally:
+            os.remove(path)
+    return results
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='log lines / songs per run, comma separated')
+    parser.add_argument('--only', choices=['vox', 'lyrics'], help='just run one of the benches')
+    parser.add_argument('--vocab-size', type=int, default=2000)
+    parser.add_argument('--regex-max-lines', type=int, default=10000, help='skip get_log_counts_regex above this, it is slow')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=1, help='report the best of this many runs')
+    parser.add_argument('--seed', type=int, default=2021)
+    parser.add_argument('--out', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results = []
+    if args.only in (None, 'vox'):
+        results += bench_vox(sizes, args, rng)
+    if args.only in (None, 'lyrics'):
+        results += bench_lyrics(sizes, args, rng)
+    report = {
+        'time': time.time(),
+        'git': git_rev(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+    }
+    s = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(s + '\n')
+    else:
+        print(s)
+    if not all(r.get('identical', True) for r in results):
+        sys.exit("engine output differs from the regex reference!")
+
+
+if __name__ == '__main__':
+    main()
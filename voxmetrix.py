@@ -2,35 +2,141 @@
 funny little guy to count videochess vox usages
 spoocecow 2021
 """
-from bs4 import BeautifulSoup
-import urllib.request
+import array
+import bisect
+import collections
+import csv
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import locale
+import mmap
+import os
+import queue
+import struct
+import sys
+import urllib.parse
 import re
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple, TYPE_CHECKING
+
+import fetchcache
+
+# bs4, http.client and concurrent.futures take longer to import than most runs take to count,
+# so they get pulled in by the functions that need them
+if TYPE_CHECKING:
+   import http.client
+   from bs4 import BeautifulSoup
 
 
 debug = True
+workers = os.cpu_count()
+phrases = False  # also mine the top vox phrases (separate pass over the local log, debug runs only)
 
 
-def get_html(url: str) -> BeautifulSoup:
-   return BeautifulSoup(
-      urllib.request.urlopen(url).read(),
-      'html.parser'
-   )
+def parse_html(page: bytes) -> 'BeautifulSoup':
+   from bs4 import BeautifulSoup
+   return BeautifulSoup(page, 'html.parser')
+
 
-def get_log_listing() -> List[str]:
-   url = 'https://rook.zone/voxlogs/'
+VOXLOG_URL = 'https://rook.zone/voxlogs/'
+VOCAB_URL = 'https://rook.zone/voxinfo.htm'
+LISTING_TTL = 60 * 60  # new logs show up about daily
+VOCAB_TTL = 24 * 60 * 60  # vox vocab changes way less than that
+
+
+def _log_links(page: bytes) -> List[str]:
    return [
-      a.text for a in get_html(url).find_all('a') if '.txt' in a.text
+      a.text for a in parse_html(page).find_all('a') if '.txt' in a.text
    ]
 
-def get_log(fn: str) -> str:
-   url = 'https://rook.zone/voxlogs/' + fn
-   return urllib.request.urlopen(url).read().decode('utf-8')
+def get_log_listing(url: str = VOXLOG_URL, ttl: float = LISTING_TTL) -> List[str]:
+   return fetchcache.fetch_parsed(url, _log_links, ttl)
+
+
+class HTTPPool:
+   """Keep-alive connections to one host, handed out to whichever thread needs one."""
+
+   def __init__(self, base_url: str):
+      import http.client
+      parts = urllib.parse.urlsplit(base_url)
+      self.conn_cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+      self.host = parts.netloc
+      self.path = parts.path
+      self._idle = queue.LifoQueue()
+
+   def get(self, fn: str, headers: Dict[str, str] = None) -> 'http.client.HTTPResponse':
+      """GET base_url + fn; the body is read into resp.body before the connection goes back in the pool."""
+      import http.client
+      try:
+         conn = self._idle.get_nowait()
+      except queue.Empty:
+         conn = self.conn_cls(self.host, timeout=30)
+      path = self.path + urllib.parse.quote(fn)
+      try:
+         conn.request('GET', path, headers=headers or {})
+         resp = conn.getresponse()
+      except (http.client.HTTPException, OSError):
+         # server probably dropped an idle keep-alive connection, one more go on a fresh one
+         conn.close()
+         conn = self.conn_cls(self.host, timeout=30)
+         conn.request('GET', path, headers=headers or {})
+         resp = conn.getresponse()
+      resp.body = resp.read()
+      self._idle.put(conn)
+      return resp
+
+   def close(self):
+      while not self._idle.empty():
+         self._idle.get_nowait().close()
+
+
+def fetch_logs(logfiles: List[str], url: str = VOXLOG_URL, workers: int = 8) -> Iterator[Tuple[str, str]]:
+   """
+   Download logs over pooled connections, workers at a time, yielding (filename, text) in listing order.
+   Only a couple of logs per worker get ahead of the consumer, so the whole history is never in memory.
+   """
+   import concurrent.futures
+   import urllib.error
+   pool = HTTPPool(url)
+
+   def fetch(fn: str) -> str:
+      resp = pool.get(fn)
+      if resp.status != 200:
+         raise urllib.error.HTTPError(url + fn, resp.status, resp.reason, resp.headers, None)
+      return resp.body.decode('utf-8')
+
+   try:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+         todo = iter(logfiles)
+         ahead = collections.deque((fn, ex.submit(fetch, fn)) for fn in itertools.islice(todo, 2 * workers))
+         while ahead:
+            fn, fut = ahead.popleft()
+            nxt = next(todo, None)
+            if nxt is not None:
+               ahead.append((nxt, ex.submit(fetch, nxt)))
+            yield fn, fut.result()
+   finally:
+      pool.close()
+
+
+def count_remote_logs(vocab: List[str], url: str = VOXLOG_URL, workers: int = 8) -> Dict[str, int]:
+   """Same counts as get_log_counts over every log glued together, but each log is counted as it lands."""
+   counter = VoxCounter(vocab)
+   for fn, log in fetch_logs(get_log_listing(url), url, workers):
+      print("Getteing", fn)
+      counter.feed(log)
+      counter.feed('\n')
+   return counter.finish()
+
+
+def _vocab_boxes(page: bytes) -> List[str]:
+   return [box.text for box in parse_html(page).find_all('div', 'vocab')]
 
 
 def get_vocab(include_warns=True, include_letters=True, include_morshu=False) -> List[str]:
-   url = 'https://rook.zone/voxinfo.htm'
-   vocab_boxes = [box.text for box in get_html(url).find_all('div', 'vocab')]
+   vocab_boxes = fetchcache.fetch_parsed(VOCAB_URL, _vocab_boxes, VOCAB_TTL)
    vocab = vocab_boxes[0].split()
    if include_morshu:
       vocab += vocab_boxes[1].split()  # TODO should differentiate from normal vox where overlap?
@@ -42,7 +148,7 @@ def get_vocab(include_warns=True, include_letters=True, include_morshu=False) ->
    return vocab
 
 
-def get_log_counts(raw_log: str, vocab: List[str]) -> Dict[str, int]:
+def get_log_counts_regex(raw_log: str, vocab: List[str]) -> Dict[str, int]:
    d = {w: 0 for w in vocab}
    # make these troublesome guys easier to isolate
    clean_log = raw_log.replace("'s", " 's ").replace("n't", " n't ")
@@ -59,6 +165,671 @@ def get_log_counts(raw_log: str, vocab: List[str]) -> Dict[str, int]:
    return d
 
 
+# a vox word token is a run of anything that can't be a boundary char in get_log_counts_regex's pattern:
+# left boundary is [\s+\-.,?!\d], right boundary is [\s+\-><.,?!]
+_TOKEN_RE = re.compile(r'[^\s+\-.,?!\d<>]+')
+_FROM_RE = re.compile(r'^From .*$')
+_FROM_LINE_RE = re.compile(r'^From (.*)$', re.MULTILINE)
+
+
+def _speaker_name(s: str) -> str:
+   # undo the 's / n't spacing, From lines get found after that
+   return s.replace(" n't ", "n't").replace(" 's ", "'s").strip()
+
+
+class VoxCounter:
+   """
+   Counts vox words in a single tokenizing pass, giving exactly what get_log_counts_regex does.
+   feed() it the log in whatever pieces, then finish(); only complete lines get counted before then.
+   """
+
+   def __init__(self, vocab: List[str], lead: str = ' ', whole: bool = True, speakers: bool = False,
+                phrases: 'PhraseMiner' = None):
+      """
+      :param lead: char sitting right before the first fed char (get_log_counts_regex puts a space there)
+      :param whole: this counter sees the entire log, so the From line strip applies
+      :param speakers: also credit each counted word to whoever the From line above it names
+      :param phrases: PhraseMiner to feed runs of vox words through as they're tokenized
+      """
+      self.counts = {w: 0 for w in vocab}
+      # words that have boundary chars or regex specials in them can't be one token, regex those
+      self._odd = {
+         w: re.compile(rf'[\s+\-.,?!\d]{w}[\s+\-><.,?!]', re.MULTILINE)
+         for w in self.counts if not _TOKEN_RE.fullmatch(w) or re.escape(w) != w
+      }
+      self._tokens = set(self.counts).difference(self._odd)
+      self._last_end = {}  # word -> position of the boundary char its last match used up
+      self._prev = lead
+      self._base = 0  # position of self._prev; fed text starts at 1
+      self._pending = ''
+      self._whole = whole
+      self._fresh = True
+      # what would change if the lead char had already been used up by a match in the text before us
+      # (see partial()): tokens starting right at the lead alternate counted/skipped along a run of
+      # back-to-back repeats, odd words get a second scan until it lines back up with the first one
+      self._run = None  # [word, run length, boundary pos after the last one], while the run might continue
+      self._run_done = False
+      self._alt = {w: [0, 0] for w in self._odd}  # word -> [count difference, alt scan's last_end]
+      self._fix = {}  # word -> [count difference, whether it ends up eating the last char or not]
+      # per-speaker counts: speaker -> word -> count. words before the first From line go in _lead
+      self.speakers = {} if speakers else None
+      self._lead = {}
+      self._cur = self._lead
+      self._speaker = None
+      self._lead_header = False
+      self.phrases = phrases
+
+   def feed(self, text: str):
+      self._pending += text
+      # hold back the last line (and a trailing newline): don't know yet where it ends, or if it's the only line
+      cut = self._pending.rfind('\n', 0, len(self._pending) - 1) + 1
+      if cut:
+         self._count(self._pending[:cut])
+         self._pending = self._pending[cut:]
+
+   def finish(self) -> Dict[str, int]:
+      text, self._pending = self._pending, ''
+      if self._fresh and self._whole:
+         # no MULTILINE on the regex version's From strip, so it only ever bites a one-line log.
+         # it runs after the 's / n't split, so "Fromn't x" counts as a From line too
+         split = text.replace("'s", " 's ").replace("n't", " n't ")
+         m = _FROM_RE.match(split)
+         if m:
+            text = split[m.end():]  # just '' or the trailing newline, nothing left to split
+      if text:
+         self._count(text)
+      return self.counts
+
+   def partial(self) -> dict:
+      """
+      Counts plus what's needed to glue this piece onto the one before it exactly (see merge_partials).
+      Call after finish().
+      """
+      last = self._base
+      fix = dict(self._fix)
+      if self._run:
+         w, run_len, run_end = self._run
+         fix[w] = [-(run_len % 2), run_end == last]
+      for w, (delta, alt_end) in self._alt.items():
+         flip = (alt_end == last) != (self._last_end.get(w) == last)
+         if delta or flip:
+            fix[w] = [delta, flip]
+      part = {
+         'counts': {w: c for w, c in self.counts.items() if c},
+         'tail': [w for w, pos in self._last_end.items() if pos == last],
+         'fix': fix,
+      }
+      if self.speakers is not None:
+         part.update(speakers=self.speakers, lead=self._lead, speaker=self._speaker, lead_header=self._lead_header)
+      return part
+
+   def speaker_stats(self) -> 'SpeakerStats':
+      """Per-speaker counts as a SpeakerStats (words from before the first From line aren't anyone's)."""
+      return SpeakerStats(self.speakers)
+
+   def _count(self, text: str):
+      # make these troublesome guys easier to isolate
+      text = text.replace("'s", " 's ").replace("n't", " n't ")
+      buf = self._prev + text
+      base, n = self._base, len(buf)
+      counts, tokens, last_end = self.counts, self._tokens, self._last_end
+      froms, nf, fi, hdr_end, cur = None, 0, 0, 0, self._cur
+      miner, prev_e = self.phrases, 0
+      if self.speakers is not None:
+         # (start, end, speaker) of each From line, in buf positions
+         froms = [(m.start() + 1, m.end() + 1, _speaker_name(m.group(1))) for m in _FROM_LINE_RE.finditer(text)]
+         nf = len(froms)
+         if self._fresh and froms and froms[0][0] == 1:
+            self._lead_header = True
+      self._fresh = False
+      for m in _TOKEN_RE.finditer(buf):
+         w = m.group()
+         if w not in tokens:
+            if miner is not None:
+               miner.reset()
+            continue
+         s, e = m.span()
+         # needs a left boundary that isn't < or >, and a right one that isn't a digit
+         if s == 0 or e == n or buf[s - 1] in '<>' or buf[e].isdecimal():
+            if miner is not None:
+               miner.reset()
+            continue
+         if miner is not None:
+            # only spaces/tabs between vox words keep a phrase going; newlines, digits, punctuation break it
+            if buf[prev_e:s].strip(' \t'):
+               miner.reset()
+            miner.push(w)
+            prev_e = e
+         if not self._run_done:
+            run = self._run
+            if run is None and base + s == 1:
+               self._run = [w, 1, base + e]
+            elif run and run[0] == w and run[2] == base + s - 1:
+               run[1] += 1
+               run[2] = base + e
+            else:
+               self._run_done = True
+               if run:
+                  self._fix[run[0]] = [-(run[1] % 2), False]
+                  self._run = None
+         # can't share a left boundary with the previous match of the same word (findall doesn't overlap)
+         if last_end.get(w) == base + s - 1:
+            continue
+         counts[w] += 1
+         last_end[w] = base + e
+         if froms is not None:
+            while fi < nf and froms[fi][0] <= s:
+               _, hdr_end, self._speaker = froms[fi]
+               cur = self.speakers.setdefault(self._speaker, {})
+               fi += 1
+            if s >= hdr_end:  # the From line's own words aren't anyone's voxes
+               cur[w] = cur.get(w, 0) + 1
+      starts = [f[0] for f in froms] if froms else []
+      for w, regex in self._odd.items():
+         start = 1 if last_end.get(w) == base else 0
+         spans = [m.span() for m in regex.finditer(buf, start)]
+         counts[w] += len(spans)
+         if spans:
+            last_end[w] = base + spans[-1][1] - 1
+         if w in self._alt:
+            self._rescan(w, regex, buf, base, start, spans)
+         if froms is not None:
+            for s, _ in spans:
+               i = bisect.bisect_right(starts, s + 1) - 1
+               if i < 0:
+                  d = self._cur
+               elif s + 1 >= froms[i][1]:
+                  d = self.speakers.setdefault(froms[i][2], {})
+               else:
+                  continue
+               d[w] = d.get(w, 0) + 1
+      if froms:
+         self._speaker = froms[-1][2]
+         self._cur = self.speakers.setdefault(self._speaker, {})
+      self._prev = buf[-1]
+      self._base = base + n - 1
+
+   def _rescan(self, w: str, regex: re.Pattern, buf: str, base: int, start: int, spans: List[Tuple[int, int]]):
+      alt = self._alt[w]
+      alt_start = 1 if alt[1] == base else 0
+      if alt_start == start:
+         # both scans start from the same spot, so they agree from here on
+         self._fix[w] = [alt[0], False]
+         del self._alt[w]
+         return
+      starts = {s: i for i, (s, _) in enumerate(spans)}
+      alt_spans = [m.span() for m in regex.finditer(buf, alt_start)]
+      for i, (s, _) in enumerate(alt_spans):
+         if s in starts:
+            self._fix[w] = [alt[0] + i - starts[s], False]
+            del self._alt[w]
+            return
+      alt[0] += len(alt_spans) - len(spans)
+      if alt_spans:
+         alt[1] = base + alt_spans[-1][1] - 1
+
+
+def get_log_counts(raw_log: str, vocab: List[str]) -> Dict[str, int]:
+   counter = VoxCounter(vocab)
+   counter.feed(raw_log)
+   return counter.finish()
+
+
+def read_line_chunks(path: str, start: int = 0, end: int = None, encoding: str = None, chunk_size: int = 1 << 20) -> Iterator[str]:
+   """
+   Yield the text of a file (or the byte range start:end of it, which should sit on line starts)
+   in pieces of about chunk_size bytes that always end on a line end, newlines translated like open() does.
+   """
+   encoding = encoding or locale.getpreferredencoding(False)
+   with open(path, 'rb') as f:
+      f.seek(start)
+      left = None if end is None else end - start
+      while left is None or left > 0:
+         if left is not None and left <= chunk_size:
+            data = f.read(left)  # whatever's left of the range is whole lines
+         else:
+            data = b''.join(f.readlines(chunk_size))
+         if not data:
+            break
+         if left is not None:
+            left -= len(data)
+         yield data.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def count_log_file(path: str, vocab: List[str], encoding: str = None, chunk_size: int = 1 << 20, speakers: bool = False,
+                   phrases: 'PhraseMiner' = None):
+   """
+   get_log_counts over a log file, streamed through in line-aligned chunks instead of read in whole.
+   With speakers, returns (counts, SpeakerStats). phrases gets fed as the log goes by.
+   """
+   counter = VoxCounter(vocab, speakers=speakers, phrases=phrases)
+   for chunk in read_line_chunks(path, encoding=encoding, chunk_size=chunk_size):
+      counter.feed(chunk)
+   counts = counter.finish()
+   return (counts, counter.speaker_stats()) if speakers else counts
+
+
+def count_log_partial(log: str, vocab: List[str]) -> dict:
+   """Count one log (plus the newline main() glues after each) on its own, for merge_partials."""
+   counter = VoxCounter(vocab, lead='\n', whole=False)
+   counter.feed(log)
+   counter.feed('\n')
+   counter.finish()
+   return counter.partial()
+
+
+def _boundary_fixes(parts: List[dict]) -> Iterator[Tuple[dict, Dict[str, int]]]:
+   # yields each partial with the count corrections it needs given what the one before it ended with
+   eaten = set()  # words whose last match in the previous log used up the boundary char before this one
+   for part in parts:
+      tail = set(part['tail'])
+      deltas = {}
+      for w in eaten.intersection(part['fix']):
+         delta, flip = part['fix'][w]
+         deltas[w] = delta
+         if flip:
+            tail ^= {w}
+      yield part, deltas
+      eaten = tail
+
+
+def merge_partials(parts: List[dict], vocab: List[str]) -> Dict[str, int]:
+   """
+   Add up per-log partials in log order. Gives the same as counting all the logs glued together,
+   except for a history that's just one single-line log starting with "From " (see VoxCounter.finish)
+   """
+   totals = {w: 0 for w in vocab}
+   for part, deltas in _boundary_fixes(parts):
+      for w, c in itertools.chain(part['counts'].items(), deltas.items()):
+         if w in totals:
+            totals[w] += c
+   return totals
+
+
+def merge_speaker_partials(parts: List[dict]) -> 'SpeakerStats':
+   """SpeakerStats over partials from speakers=True counters; words before a piece's first From line go to the last speaker seen."""
+   by_user = {}
+   speaker = None
+   for part, deltas in _boundary_fixes(parts):
+      lead = dict(part['lead'])
+      if not part['lead_header']:
+         # the boundary correction lands on the piece's first word, which is in the lead bit unless it's a From line
+         for w, delta in deltas.items():
+            lead[w] = lead.get(w, 0) + delta
+      if speaker is not None:
+         d = by_user.setdefault(speaker, {})
+         for w, c in lead.items():
+            d[w] = d.get(w, 0) + c
+      for user, words in part['speakers'].items():
+         d = by_user.setdefault(user, {})
+         for w, c in words.items():
+            d[w] = d.get(w, 0) + c
+      if part['speaker'] is not None:
+         speaker = part['speaker']
+   return SpeakerStats(by_user)
+
+
+def _count_file_partial(path: str, vocab: List[str], encoding: str, speakers: bool) -> dict:
+   counter = VoxCounter(vocab, lead='\n', whole=False, speakers=speakers)
+   for chunk in read_line_chunks(path, encoding=encoding):
+      counter.feed(chunk)
+   counter.feed('\n')
+   counter.finish()
+   return counter.partial()
+
+
+def _count_range_partial(path: str, start: int, end: int, vocab: List[str], encoding: str, speakers: bool) -> dict:
+   counter = VoxCounter(vocab, lead=' ' if start == 0 else '\n', whole=False, speakers=speakers)
+   for chunk in read_line_chunks(path, start, end, encoding):
+      counter.feed(chunk)
+   counter.finish()
+   return counter.partial()
+
+
+def count_logs_parallel(paths: List[str], vocab: List[str], workers: int = None, encoding: str = None, speakers: bool = False):
+   """
+   get_log_counts over local log files glued together main()-style, one file per process pool task.
+   With speakers, returns (counts, SpeakerStats).
+   """
+   encoding = encoding or locale.getpreferredencoding(False)
+   if len(paths) == 1:
+      counter = VoxCounter(vocab, speakers=speakers)
+      for chunk in read_line_chunks(paths[0], encoding=encoding):
+         counter.feed(chunk)
+      counter.feed('\n')
+      counts = counter.finish()
+      return (counts, counter.speaker_stats()) if speakers else counts
+   import concurrent.futures
+   with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+      parts = list(ex.map(_count_file_partial, paths, itertools.repeat(vocab), itertools.repeat(encoding),
+                          itertools.repeat(speakers)))
+   counts = merge_partials(parts, vocab)
+   return (counts, merge_speaker_partials(parts)) if speakers else counts
+
+
+def count_log_file_parallel(path: str, vocab: List[str], workers: int = None, encoding: str = None, speakers: bool = False):
+   """
+   count_log_file, with the file split into line-aligned byte ranges counted across a process pool.
+   With speakers, returns (counts, SpeakerStats).
+   """
+   encoding = encoding or locale.getpreferredencoding(False)
+   workers = workers or os.cpu_count() or 1
+   size = os.path.getsize(path)
+   bounds = [0]
+   with open(path, 'rb') as f:
+      for i in range(1, workers):
+         f.seek(max(size * i // workers - 1, bounds[-1]))
+         f.readline()  # on to the next line start
+         if f.tell() >= size:
+            break
+         if f.tell() > bounds[-1]:
+            bounds.append(f.tell())
+   bounds.append(size)
+   if len(bounds) == 2:
+      return count_log_file(path, vocab, encoding, speakers=speakers)
+   import concurrent.futures
+   with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+      parts = list(ex.map(_count_range_partial, itertools.repeat(path), bounds[:-1], bounds[1:],
+                          itertools.repeat(vocab), itertools.repeat(encoding), itertools.repeat(speakers)))
+   counts = merge_partials(parts, vocab)
+   return (counts, merge_speaker_partials(parts)) if speakers else counts
+
+
+STORE_PATH = r"C:\tmp\voxstore.json"
+ROLLUP_PATH = r"C:\tmp\voxrollup.bin"
+
+
+def vocab_version(vocab: List[str]) -> str:
+   return hashlib.sha1('\n'.join(vocab).encode('utf-8')).hexdigest()
+
+
+def load_store(path: str = STORE_PATH) -> dict:
+   try:
+      with open(path, encoding='utf-8') as f:
+         return json.load(f)
+   except FileNotFoundError:
+      return {'vocab_version': None, 'logs': {}, 'totals': None}
+
+
+def save_store(store: dict, path: str = STORE_PATH):
+   tmp = path + '.tmp'
+   with open(tmp, 'w', encoding='utf-8') as f:
+      json.dump(store, f)
+   os.replace(tmp, path)
+
+
+def count_incremental(vocab: List[str], path: str = STORE_PATH, url: str = VOXLOG_URL, workers: int = 8,
+                      rollup_path: str = ROLLUP_PATH) -> Dict[str, int]:
+   """
+   Like count_remote_logs, but per-log partials are kept in a store keyed by filename so later runs
+   only download and count logs that are new or changed (conditional GETs on ETag/Last-Modified).
+   A different vocab throws the store away. The per-day rollup (see VoxRollup) is rebuilt at rollup_path when anything changed.
+   """
+   import concurrent.futures
+   import urllib.error
+   store = load_store(path)
+   version = vocab_version(vocab)
+   if store['vocab_version'] != version:
+      store = {'vocab_version': version, 'logs': {}, 'totals': None}
+   old_logs = store['logs']
+   logfiles = get_log_listing(url)
+   pool = HTTPPool(url)
+
+   def refresh(fn: str) -> dict:
+      entry = old_logs.get(fn)
+      headers = {}
+      if entry and entry.get('etag'):
+         headers['If-None-Match'] = entry['etag']
+      if entry and entry.get('last_modified'):
+         headers['If-Modified-Since'] = entry['last_modified']
+      resp = pool.get(fn, headers)
+      if resp.status == 304 and entry:
+         return entry
+      if resp.status != 200:
+         raise urllib.error.HTTPError(url + fn, resp.status, resp.reason, resp.headers, None)
+      print("Getteing", fn)
+      entry = count_log_partial(resp.body.decode('utf-8'), vocab)
+      entry['etag'] = resp.getheader('ETag')
+      entry['last_modified'] = resp.getheader('Last-Modified')
+      return entry
+
+   try:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+         new_logs = dict(zip(logfiles, ex.map(refresh, logfiles)))
+   finally:
+      pool.close()
+   changed = list(new_logs) != list(old_logs) or any(new_logs[fn] is not old_logs[fn] for fn in new_logs)
+   if changed or store['totals'] is None:
+      store['totals'] = merge_partials([new_logs[fn] for fn in logfiles], vocab)
+   store['logs'] = new_logs
+   save_store(store, path)
+   if changed or not os.path.exists(rollup_path):
+      build_rollup(daily_counts(store['logs']), vocab, rollup_path)
+   return store['totals']
+
+
+_ROLLUP_MAGIC = b'VOXROLL1'
+_DATE_RE = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+
+def log_day(fn: str) -> str:
+   """YYYY-MM-DD out of a log filename, or None if it hasn't got one"""
+   m = _DATE_RE.search(fn)
+   return '-'.join(m.groups()) if m else None
+
+
+def daily_counts(logs: Dict[str, dict]) -> Dict[str, Dict[str, int]]:
+   """Per-day counts out of per-log partials (in log order, so the boundary fixes land where they belong)."""
+   days = {}
+   for fn, (part, deltas) in zip(logs, _boundary_fixes(list(logs.values()))):
+      day = log_day(fn)
+      if day is None:
+         print("No date in", fn, "- left out of the rollup")
+         continue
+      d = days.setdefault(day, {})
+      for w, c in itertools.chain(part['counts'].items(), deltas.items()):
+         d[w] = d.get(w, 0) + c
+   return days
+
+
+def build_rollup(days: Dict[str, Dict[str, int]], vocab: List[str], path: str = ROLLUP_PATH):
+   """
+   Write per-day counts as a rollup file: a JSON header (words, days) then a table of running totals,
+   one row per day (plus a zero row up front) and one column per word, so any date range is two lookups.
+   """
+   words = list(dict.fromkeys(vocab))
+   day_list = sorted(days)
+   header = json.dumps({'words': words, 'days': day_list, 'byteorder': sys.byteorder}).encode('utf-8')
+   header += b' ' * (-(len(_ROLLUP_MAGIC) + 4 + len(header)) % 8)  # keep the table 8-byte aligned
+   running = [0] * len(words)
+   table = array.array('Q', running)
+   for day in day_list:
+      counts = days[day]
+      running = [r + counts.get(w, 0) for r, w in zip(running, words)]
+      table.extend(running)
+   tmp = path + '.tmp'
+   with open(tmp, 'wb') as f:
+      f.write(_ROLLUP_MAGIC)
+      f.write(struct.pack('<I', len(header)))
+      f.write(header)
+      table.tofile(f)
+   os.replace(tmp, path)
+
+
+class VoxRollup:
+   """Memory-mapped rollup file from build_rollup. Dates are 'YYYY-MM-DD' strings, ranges include both ends."""
+
+   def __init__(self, path: str = ROLLUP_PATH):
+      with open(path, 'rb') as f:
+         self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      if self._mm[:len(_ROLLUP_MAGIC)] != _ROLLUP_MAGIC:
+         raise ValueError("%s is not a vox rollup" % path)
+      off = len(_ROLLUP_MAGIC)
+      (header_len,) = struct.unpack_from('<I', self._mm, off)
+      header = json.loads(self._mm[off + 4:off + 4 + header_len])
+      if header['byteorder'] != sys.byteorder:
+         raise ValueError("%s was written on a %s-endian machine" % (path, header['byteorder']))
+      self.words = header['words']
+      self.days = header['days']
+      self._wid = {w: i for i, w in enumerate(self.words)}
+      self._table = memoryview(self._mm)[off + 4 + header_len:].cast('Q')
+
+   def close(self):
+      self._table.release()
+      self._mm.close()
+
+   def _rows(self, start: str, end: str) -> Tuple[int, int]:
+      lo = bisect.bisect_left(self.days, start or '')
+      hi = bisect.bisect_right(self.days, end or '\uffff')
+      return lo, max(hi, lo)  # start after end is just an empty range
+
+   def count(self, word: str, start: str = None, end: str = None) -> int:
+      w = self._wid.get(word)
+      if w is None:
+         return 0
+      lo, hi = self._rows(start, end)
+      n = len(self.words)
+      return self._table[hi * n + w] - self._table[lo * n + w]
+
+   def totals(self, start: str = None, end: str = None) -> Dict[str, int]:
+      lo, hi = self._rows(start, end)
+      n = len(self.words)
+      before, after = self._table[lo * n:(lo + 1) * n], self._table[hi * n:(hi + 1) * n]
+      return {w: a - b for w, a, b in zip(self.words, after, before)}
+
+   def top(self, start: str = None, end: str = None, n: int = 25) -> List[Tuple[str, int]]:
+      return heapq.nlargest(n, self.totals(start, end).items(), key=lambda wc: wc[1])
+
+   def daily(self, word: str, start: str = None, end: str = None) -> List[Tuple[str, int]]:
+      w = self._wid.get(word)
+      lo, hi = self._rows(start, end)
+      if w is None:
+         return [(day, 0) for day in self.days[lo:hi]]
+      n = len(self.words)
+      col = self._table[w::n]  # running totals for this word, zero row first
+      return [(self.days[i], col[i + 1] - col[i]) for i in range(lo, hi)]
+
+
+class SpaceSaving:
+   """
+   Space-Saving heavy hitters sketch: approximate counts for the most frequent items in a fixed number of slots.
+   A reported count is never under the true one and over it by at most its err; anything that
+   really occurred more than total / capacity times is guaranteed to be in there.
+   """
+
+   def __init__(self, capacity: int):
+      self.capacity = capacity
+      self.total = 0
+      self._slots = {}  # item -> [count, err]
+      self._heap = []  # (count, item), one per slot; counts can lag behind _slots, fixed up on eviction
+
+   def add(self, item: str):
+      self.total += 1
+      slot = self._slots.get(item)
+      if slot:
+         slot[0] += 1
+         return
+      if len(self._slots) < self.capacity:
+         self._slots[item] = [1, 0]
+         heapq.heappush(self._heap, (1, item))
+         return
+      # kick out the smallest count; the newcomer inherits it as its possible overcount
+      while True:
+         count, victim = self._heap[0]
+         actual = self._slots[victim][0]
+         if actual == count:
+            break
+         heapq.heapreplace(self._heap, (actual, victim))
+      del self._slots[victim]
+      self._slots[item] = [count + 1, count]
+      heapq.heapreplace(self._heap, (count + 1, item))
+
+   def top(self, k: int) -> List[Tuple[str, int, int]]:
+      """(item, count, err) for the k biggest counts; the true count is between count - err and count"""
+      return [(item, c, err) for item, (c, err) in heapq.nlargest(k, self._slots.items(), key=lambda kv: kv[1][0])]
+
+
+class PhraseMiner:
+   """
+   Approximate top-k vox phrases: every run of n vox words separated only by spaces/tabs (n_min..n_max)
+   goes into a SpaceSaving sketch per n, so memory stays at n_max - n_min + 1 sketches of capacity slots.
+   Words that only the regex fallback in VoxCounter can count aren't part of phrases.
+   Only main()'s debug run over a local log mines phrases; count_incremental doesn't, since a sketch
+   can't be patched up per changed log the way the counts are.
+   """
+
+   def __init__(self, n_min: int = 2, n_max: int = 6, capacity: int = 10000):
+      self.n_min = n_min
+      self.n_max = n_max
+      self.sketches = {n: SpaceSaving(capacity) for n in range(n_min, n_max + 1)}
+      self._window = collections.deque(maxlen=n_max)
+
+   def reset(self):
+      self._window.clear()
+
+   def push(self, word: str):
+      window = self._window
+      window.append(word)
+      for n in range(self.n_min, len(window) + 1):
+         self.sketches[n].add(' '.join(itertools.islice(window, len(window) - n, None)))
+
+   def top(self, k: int = 25) -> Dict[int, List[Tuple[str, int, int]]]:
+      return {n: sketch.top(k) for n, sketch in self.sketches.items()}
+
+
+class SpeakerStats:
+   """
+   Speaker x word counts as a sparse matrix: CSR rows per speaker and a CSC copy per word,
+   each row/column's entries kept sorted by count (highest first) so top-N is just a slice.
+   """
+
+   def __init__(self, by_user: Dict[str, Dict[str, int]]):
+      self.users = sorted(by_user)
+      self.words = sorted({w for words in by_user.values() for w, c in words.items() if c})
+      self._uid = {u: i for i, u in enumerate(self.users)}
+      self._wid = {w: i for i, w in enumerate(self.words)}
+      cells = [
+         (self._uid[u], self._wid[w], c) for u in self.users for w, c in by_user[u].items() if c > 0
+      ]
+      self.row_ptr, self.row_idx, self.row_val = self._compress(cells, 0, 1, len(self.users))
+      self.col_ptr, self.col_idx, self.col_val = self._compress(cells, 1, 0, len(self.words))
+
+   @staticmethod
+   def _compress(cells: list, major: int, minor: int, n: int) -> Tuple[array.array, array.array, array.array]:
+      cells = sorted(cells, key=lambda cell: (cell[major], -cell[2], cell[minor]))
+      ptr = array.array('L', [0] * (n + 1))
+      for cell in cells:
+         ptr[cell[major] + 1] += 1
+      for i in range(n):
+         ptr[i + 1] += ptr[i]
+      return ptr, array.array('L', (cell[minor] for cell in cells)), array.array('L', (cell[2] for cell in cells))
+
+   def top_words(self, user: str, n: int = 10) -> List[Tuple[str, int]]:
+      i = self._uid.get(user)
+      if i is None:
+         return []
+      lo, hi = self.row_ptr[i], min(self.row_ptr[i + 1], self.row_ptr[i] + n)
+      return [(self.words[self.row_idx[k]], self.row_val[k]) for k in range(lo, hi)]
+
+   def top_users(self, word: str, n: int = 10) -> List[Tuple[str, int]]:
+      j = self._wid.get(word)
+      if j is None:
+         return []
+      lo, hi = self.col_ptr[j], min(self.col_ptr[j + 1], self.col_ptr[j] + n)
+      return [(self.users[self.col_idx[k]], self.col_val[k]) for k in range(lo, hi)]
+
+   def to_csv(self) -> str:
+      # speaker names are whatever followed "From " so they can have commas/quotes in them, let csv quote those
+      out = io.StringIO()
+      writer = csv.writer(out, lineterminator='\n')
+      writer.writerow(['User', 'Word', 'Count'])
+      writer.writerows(
+         (u, self.words[self.row_idx[k]], self.row_val[k])
+         for i, u in enumerate(self.users) for k in range(self.row_ptr[i], self.row_ptr[i + 1])
+      )
+      return out.getvalue()
+
+
 def to_csv(counts: Dict[str, int]):
    s = "Word,Count\n"
    s += "\n".join(
@@ -70,24 +841,25 @@ def to_csv(counts: Dict[str, int]):
 def main():
    vocab = get_vocab()
    if debug:
-      with open(r"C:\tmp\logsmash.txt") as f:
-         logsmash = f.read()
+      print("Counteing...")
+      d, by_speaker = count_log_file_parallel(r"C:\tmp\logsmash.txt", vocab, workers, speakers=True)
+      if phrases:
+         miner = PhraseMiner()
+         count_log_file(r"C:\tmp\logsmash.txt", vocab, phrases=miner)
+         for n, top in miner.top(10).items():
+            print(f"-- {n}-word phrases --")
+            for i, (p, c, err) in enumerate(top):
+               print(f"{i}. {p}\t{c} (+-{err})")
    else:
-      logfiles = get_log_listing()
-      logsmash = ''
-      for f in logfiles:
-         print("Getteing", f)
-         logsmash += get_log(f) + '\n'
-   print("Counteing...")
-   d = get_log_counts(logsmash, vocab)
+      d = count_incremental(vocab)
    for i, (w,c) in enumerate(sorted(d.items(), key=lambda x:x[1], reverse=True)[:25]):
       print( f"{i}. {w}\t{c}" )
    csv = to_csv(d)
    if debug:
       with open(r"C:\tmp\voxcounts.csv", "w+") as f:
          f.write(csv)
-      with open(r"C:\tmp\logsmash.txt", "wb+") as f:
-         f.write(logsmash.encode('utf-8'))
+      with open(r"C:\tmp\voxspeakers.csv", "w+") as f:
+         f.write(by_speaker.to_csv())
    return d
 
 
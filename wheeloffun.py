@@ -1,29 +1,62 @@
 import string
 
-from bs4 import BeautifulSoup
+import bisect
+import itertools
+import json
+import mmap
+import os
+import queue
 import re
-import urllib.error
-import urllib.request
+import struct
+import sys
+import threading
 import random
 import time
+from typing import TYPE_CHECKING
 
-def get_lyrics_doc(lyric_id:int) -> BeautifulSoup:
+# bs4, urllib.request, concurrent.futures and http.server are imported where they're used, so
+# `search` and friends don't pay for them at startup
+if TYPE_CHECKING:
+    import http.server
+    from bs4 import BeautifulSoup
+
+def fetch_lyrics_status(lyric_id:int) -> tuple:
+    """
+    Fetch a song page.
+    :return: (http status, page bytes), page is None for HTTP errors and 'Does Not Exist' pages.
+             Network errors (timeouts, resets, ...) are raised.
+    """
+    import urllib.error
+    import urllib.request
     try:
         html_url = urllib.request.urlopen("https://songmeanings.com/songs/view/%d/" % lyric_id)
-    except urllib.error.HTTPError:
-        return None
+    except urllib.error.HTTPError as e:
+        return e.code, None
     doc = html_url.read()
     if b'Error - Does Not Exist' in doc:
+        return html_url.status, None
+    return html_url.status, doc
+
+def fetch_lyrics_page(lyric_id:int) -> bytes:
+    return fetch_lyrics_status(lyric_id)[1]
+
+def parse_lyrics_page(page:bytes) -> 'BeautifulSoup':
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(page, 'html.parser')
+
+def get_lyrics_doc(lyric_id:int) -> 'BeautifulSoup':
+    doc = fetch_lyrics_page(lyric_id)
+    if not doc:
         return None
-    return BeautifulSoup(doc, 'html.parser')
+    return parse_lyrics_page(doc)
 
-def get_comments_count(soup:BeautifulSoup) -> str:
+def get_comments_count(soup:'BeautifulSoup') -> str:
     return soup.find('a', id='header-comments-counter').text.split()[0]
 
-def get_lyrics(soup:BeautifulSoup) -> str:
+def get_lyrics(soup:'BeautifulSoup') -> str:
     return soup.find('div', 'lyric-box').text.replace("'", '').replace('"', '').replace('/', '').strip()
 
-def get_title(soup:BeautifulSoup) -> str:
+def get_title(soup:'BeautifulSoup') -> str:
     return soup.title.text[:-1 * len(' Lyrics | SongMeanings')].strip()
 
 def get_lyrics_match(lyrics:str, regex:re.Pattern) -> str:
@@ -44,30 +77,371 @@ def make_regex(word_lengths:list) -> re.Pattern:
 WHEEL_PATTERN = [5,5,4,3,2,5,5,3,3,4]
 WHEEL_RE = make_regex(WHEEL_PATTERN)
 
+# offline corpus: magic, then one record per song, appended as we crawl.
+# record = header (id, comments, title len, lyrics len, word count) + title + lyrics + word lengths (1 byte/word)
+CORPUS_PATH = r"C:\tmp\wheel.corpus"
+CORPUS_MAGIC = b'WOFC\x01'
+_CORPUS_REC = struct.Struct('<5I')
+_WORD_RE = re.compile(r'\w+')
+
+def word_lengths(lyrics:str) -> bytes:
+    return bytes(min(len(w), 255) for w in _WORD_RE.findall(lyrics))
+
+def corpus_record(lyric_id:int, title:str, comments:str, lyrics:str) -> bytes:
+    title_b = title.encode('utf-8')
+    lyrics_b = lyrics.encode('utf-8')
+    lengths = word_lengths(lyrics)
+    try:
+        n_comments = int(comments.replace(',', ''))
+    except ValueError:
+        n_comments = 0
+    return _CORPUS_REC.pack(lyric_id, n_comments, len(title_b), len(lyrics_b), len(lengths)) + title_b + lyrics_b + lengths
+
+def _search_shard(path:str, entries:list, pattern:list) -> list:
+    # any regex hit has to be a run of consecutive word lengths, so bytes.find is a cheap prefilter;
+    # candidates get the real regex so results are the same as get_lyrics_match on the live page
+    needle = bytes(min(n, 255) for n in pattern)
+    regex = make_regex(pattern)
+    found = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for (lyric_id, comments, title_off, title_len, lyrics_off, lyrics_len, words_off, n_words) in entries:
+            if mm.find(needle, words_off, words_off + n_words) == -1:
+                continue
+            lm = get_lyrics_match(mm[lyrics_off:lyrics_off + lyrics_len].decode('utf-8'), regex)
+            if lm:
+                found.append((lyric_id, mm[title_off:title_off + title_len].decode('utf-8'), lm))
+    return found
+
+class Corpus:
+    """Memory-mapped view of a corpus file written by the crawl writer (CORPUS_MAGIC + corpus_records)."""
+
+    def __init__(self, path:str):
+        self.path = path
+        self.entries = []  # (id, comments, title off, title len, lyrics off, lyrics len, words off, word count)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(CORPUS_MAGIC)] != CORPUS_MAGIC:
+                raise ValueError("%s is not a wheel corpus" % path)
+            off = len(CORPUS_MAGIC)
+            while off + _CORPUS_REC.size <= len(mm):
+                lyric_id, comments, title_len, lyrics_len, n_words = _CORPUS_REC.unpack_from(mm, off)
+                title_off = off + _CORPUS_REC.size
+                lyrics_off = title_off + title_len
+                words_off = lyrics_off + lyrics_len
+                off = words_off + n_words
+                if off > len(mm):
+                    break  # torn write at the end from a killed crawl, ignore it
+                self.entries.append((lyric_id, comments, title_off, title_len, lyrics_off, lyrics_len, words_off, n_words))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, pattern:list, workers:int=None) -> list:
+        """Run a word-length pattern over every song, sharded across processes."""
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(self.entries) < 1000:
+            return _search_shard(self.path, self.entries, pattern)
+        step = -(-len(self.entries) // workers)
+        shards = [self.entries[i:i + step] for i in range(0, len(self.entries), step)]
+        found = []
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for res in pool.map(_search_shard, [self.path] * len(shards), shards, [pattern] * len(shards)):
+                found += res
+        return found
+
+class CrawlStats:
+    """
+    Crawl counters and timing histograms. Recording is a lock + a few int bumps, so it's cheap
+    enough for the hot loop; snapshots go out as JSON lines and/or over a local HTTP endpoint.
+    """
+
+    LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # last bucket is everything slower
+
+    def __init__(self):
+        self.started = time.time()
+        self.pages = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_found = 0  # 404s and 'Does Not Exist' pages
+        self.net_errors = 0  # timeouts, resets, DNS...
+        self.parse_errors = 0
+        self.statuses = {}  # http status -> count, so 429s/5xx (throttling) stand out from real misses
+        self.fetch_hist = [0] * (len(CrawlStats.LATENCY_BUCKETS_MS) + 1)
+        self.fetch_secs = 0.0
+        self.parse_secs = 0.0
+        self.match_secs = 0.0
+        self.queue_depth = lambda: 0
+        self._lock = threading.Lock()
+        self._emit_window = [self.started, 0]  # emit()'s own recent-rate window, see snapshot()
+        self._emit_lock = threading.Lock()
+
+    def record_fetch(self, secs:float, status:int, found:bool):
+        """:param status: http status, or None if the request never got a response"""
+        bucket = bisect.bisect_left(CrawlStats.LATENCY_BUCKETS_MS, secs * 1000)
+        with self._lock:
+            self.fetch_hist[bucket] += 1
+            self.fetch_secs += secs
+            if status is None:
+                self.net_errors += 1
+                return
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if not found and status in (200, 404):
+                self.not_found += 1
+
+    def record_page(self, parse_secs:float, match_secs:float, hit:bool):
+        with self._lock:
+            self.pages += 1
+            self.parse_secs += parse_secs
+            self.match_secs += match_secs
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def record_parse_error(self):
+        with self._lock:
+            self.parse_errors += 1
+
+    def snapshot(self, window:list=None) -> dict:
+        """
+        Current counters as a plain dict.
+        :param window: the caller's own [time, pages] from its last snapshot, updated in place, so
+                       recent_pages_per_sec covers just the time since then (default: since the start).
+                       Each consumer (JSONL file, http endpoint) keeps its own so they don't step on each other.
+        """
+        now = time.time()
+        with self._lock:
+            last_t, last_pages = window or (self.started, 0)
+            fetches = sum(self.fetch_hist)
+            snap = {
+                'time': now,
+                'elapsed': now - self.started,
+                'pages': self.pages,
+                'pages_per_sec': self.pages / max(now - self.started, 1e-9),
+                'recent_pages_per_sec': (self.pages - last_pages) / max(now - last_t, 1e-9),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_found': self.not_found,
+                'net_errors': self.net_errors,
+                'statuses': {str(code): n for code, n in sorted(self.statuses.items())},
+                'parse_errors': self.parse_errors,
+                'fetch_ms_avg': 1000 * self.fetch_secs / max(fetches, 1),
+                'fetch_ms_hist': dict(zip([str(b) for b in CrawlStats.LATENCY_BUCKETS_MS] + ['inf'], self.fetch_hist)),
+                'parse_ms_avg': 1000 * self.parse_secs / max(self.pages, 1),
+                'match_ms_avg': 1000 * self.match_secs / max(self.pages, 1),
+                'queue_depth': self.queue_depth(),
+            }
+            if window is not None:
+                window[:] = [now, self.pages]
+        return snap
+
+    def emit(self, path:str):
+        """Append one JSON snapshot line to path."""
+        with self._emit_lock:
+            snap = self.snapshot(self._emit_window)
+            with open(path, 'a') as f:
+                f.write(json.dumps(snap) + '\n')
+
+    def emit_every(self, interval:float, path:str) -> threading.Thread:
+        """emit() to path every interval seconds from a daemon thread. Call emit() once more at the end."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.emit(path)
+        t = threading.Thread(target=loop, name='crawl-stats', daemon=True)
+        t.start()
+        return t
+
+    def serve(self, port:int) -> 'http.server.HTTPServer':
+        """Serve the current snapshot as JSON on http://127.0.0.1:port/ from a daemon thread."""
+        import http.server
+        stats = self
+        window = [self.started, 0]
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(stats.snapshot(window)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=server.serve_forever, name='crawl-stats-http', daemon=True).start()
+        return server
+
+# stats go here every STATS_INTERVAL seconds; STATS_PORT=0 means no http endpoint
+STATS_PATH = r"C:\tmp\wheel_stats.jsonl"
+STATS_INTERVAL = 10
+STATS_PORT = 0
+
+# crawl stage sizes; PARSERS=None is one parser process per core
+FETCHERS = 4
+PARSERS = None
+QUEUE_SIZE = 64
+
 g_counter = 0
 
-def main(lyric_id:int):
+def _parse_and_match(lyric_id:int, page:bytes, regex:re.Pattern) -> tuple:
+    # runs in the parser process pool, so only plain picklable stuff goes back
+    t0 = time.perf_counter()
+    doc = parse_lyrics_page(page)
+    title, comments, lyrics = get_title(doc), get_comments_count(doc), get_lyrics(doc)
+    t1 = time.perf_counter()
+    lm = get_lyrics_match(lyrics, regex)
+    return lyric_id, title, comments, lyrics, lm, t1 - t0, time.perf_counter() - t1
+
+def _write_results(pending:queue.Queue, n_fetchers:int, flush_every:float, stats:CrawlStats):
+    # single writer: batches corpus records + matches, flushes every flush_every seconds
     global g_counter
-    doc = get_lyrics_doc(lyric_id)
-    if not doc:
-        return
-    g_counter += 1
-    print("{:5}. {:6} - {} ({} comments)...".format(g_counter, lyric_id, get_title(doc), get_comments_count(doc)))
-    lm = get_lyrics_match( get_lyrics(doc), WHEEL_RE )
-    if lm:
-        s = "{}: {}({}): {}".format(time.asctime(), get_title(doc), lyric_id, lm)
-        print('*' * len(s))
-        print(s)
-        print('*' * len(s))
-        with open(r"C:\tmp\wheel.txt", 'a') as f:
-            f.write(s + '\n')
+    records, hits = [], []
+    last_flush = time.time()
 
-if __name__ == "__main__":
-    visited = []
+    def flush():
+        if records:
+            with open(CORPUS_PATH, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(CORPUS_MAGIC)
+                f.write(b''.join(records))
+            records.clear()
+        if hits:
+            with open(r"C:\tmp\wheel.txt", 'a') as f:
+                f.write(''.join(hits))
+            hits.clear()
+
+    done = 0
+    try:
+        while done < n_fetchers:
+            item = pending.get()
+            if item is None:
+                done += 1
+                continue
+            lid, fut = item
+            try:
+                lyric_id, title, comments, lyrics, lm, parse_secs, match_secs = fut.result()
+            except Exception as e:
+                # one weird page (no lyric box etc.) shouldn't take the whole crawl down
+                if stats:
+                    stats.record_parse_error()
+                print("{:6} - couldn't parse: {!r}".format(lid, e), file=sys.stderr)
+                continue
+            g_counter += 1
+            if stats:
+                stats.record_page(parse_secs, match_secs, bool(lm))
+            else:
+                print("{:5}. {:6} - {} ({} comments)...".format(g_counter, lyric_id, title, comments))
+            records.append(corpus_record(lyric_id, title, comments, lyrics))
+            if lm:
+                s = "{}: {}({}): {}".format(time.asctime(), title, lyric_id, lm)
+                print('*' * len(s))
+                print(s)
+                print('*' * len(s))
+                hits.append(s + '\n')
+            if time.time() - last_flush >= flush_every:
+                flush()
+                last_flush = time.time()
+    finally:
+        flush()  # whatever's batched up is on disk even if something above blew up
+
+def crawl(lyric_ids, fetchers:int=4, parsers:int=None, queue_size:int=64, delay:float=0.25, flush_every:float=5.0, stats:CrawlStats=None):
+    """
+    Pipelined crawl: fetcher threads -> parser process pool (parse + match) -> one writer.
+    Fetched pages wait in a queue of at most queue_size futures, so if parsing falls behind
+    the fetchers block instead of piling pages up in memory.
+    :param lyric_ids: iterable of song ids to visit
+    :param fetchers: number of fetch threads, each sleeping delay seconds between requests
+    :param parsers: parser processes (default: one per core)
+    :param flush_every: seconds between writer flushes to the result/corpus files
+    """
+    parsers = parsers or os.cpu_count() or 1
+    ids = queue.Queue(maxsize=queue_size)
+    pending = queue.Queue(maxsize=queue_size)
+    if stats:
+        stats.queue_depth = pending.qsize
+
+    # set once the last fetcher is gone (normally or not), so feed stops waiting on a queue nobody drains
+    fetchers_gone = threading.Event()
+    alive = [fetchers]
+    alive_lock = threading.Lock()
+
+    def feed():
+        for lid in itertools.chain(lyric_ids, [None] * fetchers):
+            while True:
+                try:
+                    ids.put(lid, timeout=0.5)
+                    break
+                except queue.Full:
+                    if fetchers_gone.is_set():
+                        return
+
+    def fetch(pool):
+        import http.client
+        try:
+            while True:
+                lid = ids.get()
+                if lid is None:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    status, page = fetch_lyrics_status(lid)
+                except (OSError, http.client.HTTPException) as e:
+                    # URLError, timeouts, resets... skip this one and keep going
+                    status, page = None, None
+                    if not stats:
+                        print("{:6} - fetch failed: {!r}".format(lid, e), file=sys.stderr)
+                if stats:
+                    stats.record_fetch(time.perf_counter() - t0, status, page is not None)
+                if page:
+                    pending.put((lid, pool.submit(_parse_and_match, lid, page, WHEEL_RE)))
+                time.sleep(delay)
+        finally:
+            pending.put(None)  # the writer waits for one of these per fetcher, no matter what
+            with alive_lock:
+                alive[0] -= 1
+                if not alive[0]:
+                    fetchers_gone.set()
+
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parsers) as pool:
+        threading.Thread(target=feed, name='crawl-feed', daemon=True).start()
+        threads = [threading.Thread(target=fetch, args=(pool,), name='crawl-fetch-%d' % i, daemon=True) for i in range(fetchers)]
+        for t in threads:
+            t.start()
+        _write_results(pending, fetchers, flush_every, stats)
+        for t in threads:
+            t.join()  # feed isn't joined: it can be stuck waiting on ids if the fetchers died
+
+def random_ids(n:int):
+    visited = set()
     lid = random.randint(1000,160000)
-    while len(visited) < 95000:
+    while len(visited) < n:
         while lid in visited:
             lid = random.randint(1000,150000)
-        main(lid)
-        visited.append(lid)
-        time.sleep(0.25)
\ No newline at end of file
+        visited.add(lid)
+        yield lid
+
+def search_main(pattern:list):
+    corpus = Corpus(CORPUS_PATH)
+    t = time.time()
+    found = corpus.search(pattern)
+    for lyric_id, title, lm in found:
+        print("{}({}): {}".format(title, lyric_id, lm))
+    print("{} matches in {} songs ({:.2f}s)".format(len(found), len(corpus), time.time() - t))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == 'search':
+        # python wheeloffun.py search 5 5 4 3 2
+        search_main([int(n) for n in sys.argv[2:]])
+        sys.exit()
+    g_stats = CrawlStats()
+    g_stats.emit_every(STATS_INTERVAL, STATS_PATH)
+    if STATS_PORT:
+        g_stats.serve(STATS_PORT)
+    try:
+        crawl(random_ids(95000), fetchers=FETCHERS, parsers=PARSERS, queue_size=QUEUE_SIZE, stats=g_stats)
+    finally:
+        g_stats.emit(STATS_PATH)  # the last < STATS_INTERVAL seconds